@@ -1,8 +1,17 @@
 import streamlit as st
-import json
+import io
 import os
-from bs4 import BeautifulSoup
-from datetime import datetime
+import time
+import zipfile
+import ijson
+import orjson
+import lxml.etree
+import lxml.html
+from concurrent.futures import ThreadPoolExecutor
+
+# Pretty-printed JSON for the editable text areas, serialized with orjson
+def _dumps(obj):
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
 
 st.set_page_config(page_title="Playwright Test Generator", layout="wide")
 st.title("GenAI-powered Playwright Test Generator")
@@ -20,7 +29,7 @@ if st.button("Match Step Definitions to UI Actions"):
     step_lines = step_defs.splitlines()
     mock_mapping = {step: {"action": "click", "target": ui.get("text", "")} 
                     for step, ui in zip(step_lines, st.session_state.ui_data[:len(step_lines)])}
-    st.session_state.mapping_json = json.dumps(mock_mapping, indent=2)
+    st.session_state.mapping_json = _dumps(mock_mapping)
 
 st.text_area("Step to UI Action Mapping (editable)", value=st.session_state.mapping_json, key="mapping_json_editor", height=250)
 
@@ -35,45 +44,81 @@ har_file = st.file_uploader("Upload HAR File", type=['har'])
 # Additional instructions
 custom_instructions = st.text_area("Custom Instructions (optional)", height=100)
 
+# Elements worth extracting from DOM snapshots, matched in a single XPath pass.
+# Compiled once per server process rather than on every script rerun.
+@st.cache_resource
+def get_extract_xpath():
+    return lxml.etree.XPath(
+        "//*[self::h1 or self::h2 or self::p or self::button or self::input or self::span or self::div]"
+    )
+
+# Extract elements from one DOM snapshot, memoized on the snapshot bytes
+@st.cache_data(show_spinner=False, max_entries=32)
+def _parse_dom_cached(dom_bytes):
+    try:
+        # Uploads are UTF-8; without this libxml2 falls back to Latin-1 when there is no <meta charset>
+        tree = lxml.html.document_fromstring(dom_bytes, parser=lxml.html.HTMLParser(encoding="utf-8"))
+    except lxml.etree.ParserError:
+        # Blank input, or only a comment or XML declaration: nothing to extract
+        return []
+    return [
+        {"text": text, "html": lxml.etree.tostring(el, encoding="unicode", with_tail=False)}
+        for el in get_extract_xpath()(tree)
+        if (text := el.text_content().strip())
+    ]
+
 # Parse DOM snapshots
 def parse_dom(dom_contents):
     extracted_data = []
     for dom in dom_contents:
-        soup = BeautifulSoup(dom, 'html.parser')
-        elements = soup.find_all(["h1", "h2", "p", "button", "input", "span", "div"])
-        for el in elements:
-            text = el.get_text(strip=True)
-            if text:
-                extracted_data.append({"text": text, "html": str(el)})
+        extracted_data.extend(_parse_dom_cached(dom))
     return extracted_data
 
+# Extract JSON responses from HAR bytes, streaming entries and memoized on the file contents
+@st.cache_data(show_spinner=False, max_entries=32)
+def _parse_har_cached(har_bytes):
+    json_bodies = []
+    for entry in ijson.items(io.BytesIO(har_bytes), "log.entries.item"):
+        try:
+            content = entry["response"].get("content", {})
+            if content.get("mimeType", "").startswith("application/json"):
+                text = content.get("text")
+                if text:
+                    json_bodies.append({
+                        "url": entry.get("request", {}).get("url", ""),
+                        "json": orjson.loads(text)
+                    })
+        except Exception:
+            continue
+    return json_bodies
+
 # Parse HAR and extract JSON responses
-def parse_har(har_raw):
+def parse_har(har_file):
     try:
-        har = json.loads(har_raw)
-        entries = har.get("log", {}).get("entries", [])
-        json_bodies = []
-        for entry in entries:
-            try:
-                content = entry["response"].get("content", {})
-                if content.get("mimeType", "").startswith("application/json"):
-                    text = content.get("text")
-                    if text:
-                        json_bodies.append({
-                            "url": entry.get("request", {}).get("url", ""),
-                            "json": json.loads(text)
-                        })
-            except Exception:
-                continue
-        return json_bodies
+        return _parse_har_cached(har_file.getvalue())
     except Exception as e:
         st.error(f"HAR parsing failed: {e}")
         return []
 
-# Save uploaded and processed data
-def save_file(filename, content):
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(content)
+# Save uploaded and processed data into a single run archive, one write instead of one file per artifact
+def add_to_bundle(bundle, members):
+    for name, content in members:
+        bundle.writestr(name, content)
+
+# Lookups reused across "Match UI to API" clicks; both are reset whenever the DOM and HAR are re-parsed
+def build_ui_text_index(ui_data):
+    return [(node["text"].lower(), node) for node in ui_data]
+
+# First entry whose URL contains the keyword, scanned once per keyword
+def find_api_entry(api_keyword):
+    matches = st.session_state.api_match_cache
+    if api_keyword not in matches:
+        matches[api_keyword] = next((entry for entry in st.session_state.api_data if api_keyword in entry["url"]), None)
+    return matches[api_keyword]
+
+def find_ui_node(dom_keyword):
+    dom_keyword = dom_keyword.lower()
+    return next((node for text, node in st.session_state.ui_text_index if dom_keyword in text), None)
 
 # Global vars for session state
 if "ui_data" not in st.session_state:
@@ -86,32 +131,48 @@ if "ui_api_mapping_json" not in st.session_state:
     st.session_state.ui_api_mapping_json = ""
 if "ui_api_mappings" not in st.session_state:
     st.session_state.ui_api_mappings = []
+if "api_match_cache" not in st.session_state:
+    st.session_state.api_match_cache = {}
+if "ui_text_index" not in st.session_state:
+    st.session_state.ui_text_index = build_ui_text_index(st.session_state.ui_data)
 
 # Process inputs
 if st.button("Generate Playwright Test"):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-    dom_contents = [f.read().decode("utf-8") for f in dom_files] if dom_files else []
-    har_raw = har_file.read().decode("utf-8") if har_file else ""
+    timestamp = f"{time.time_ns():x}"
+
+    dom_contents = [f.read() for f in dom_files] if dom_files else []
+
+    # Inputs to save
+    input_members = [
+        ("step_definitions.txt", step_defs),
+        ("ui_flow.json", ui_json),
+    ]
+    input_members += [(f"dom_snapshot_{i+1}.html", dom) for i, dom in enumerate(dom_contents)]
+    if har_file:
+        input_members.append(("har.har", har_file.getvalue()))
+    if custom_instructions:
+        input_members.append(("instructions.txt", custom_instructions))
 
-    st.session_state.ui_data = parse_dom(dom_contents)
-    st.session_state.api_data = parse_har(har_raw)
+    bundle_name = f"run_{timestamp}.zip"
+    with open(bundle_name, "wb", buffering=1 << 20) as f, zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as bundle:
+        # Compress and write the raw uploads on a worker thread while the DOM and HAR are parsed;
+        # zlib and lxml both release the GIL, so the two overlap
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            inputs_saved = executor.submit(add_to_bundle, bundle, input_members)
+            st.session_state.ui_data = parse_dom(dom_contents)
+            st.session_state.api_data = parse_har(har_file) if har_file else []
+            inputs_saved.result()
 
-    # Save inputs
-    save_file(f"step_definitions_{timestamp}.txt", step_defs)
-    save_file(f"ui_flow_{timestamp}.json", ui_json)
-    for i, dom in enumerate(dom_contents):
-        save_file(f"dom_snapshot_{i+1}_{timestamp}.html", dom)
-    if har_raw:
-        save_file(f"har_{timestamp}.har", har_raw)
-    if custom_instructions:
-        save_file(f"instructions_{timestamp}.txt", custom_instructions)
+        st.session_state.api_match_cache = {}
+        st.session_state.ui_text_index = build_ui_text_index(st.session_state.ui_data)
 
-    # Save parsed DOM and HAR data
-    save_file(f"parsed_dom_{timestamp}.json", json.dumps(st.session_state.ui_data, indent=2))
-    save_file(f"parsed_har_{timestamp}.json", json.dumps(st.session_state.api_data, indent=2))
+        # Save parsed DOM and HAR data
+        add_to_bundle(bundle, [
+            ("parsed_dom.json", orjson.dumps(st.session_state.ui_data)),
+            ("parsed_har.json", orjson.dumps(st.session_state.api_data)),
+        ])
 
-    st.success("All files saved successfully, including parsed DOM and HAR.")
+    st.success(f"All files saved successfully to {bundle_name}, including parsed DOM and HAR.")
 
 st.markdown("---")
 st.header("UI ↔ API Mapping via GenAI")
@@ -143,8 +204,8 @@ for idx in range(len(st.session_state.ui_api_mappings)):
             st.experimental_rerun()
 
     if st.button(f"Match UI to API {idx + 1}"):
-        matched_api = next((entry for entry in st.session_state.api_data if api_keyword in entry["url"]), None)
-        matched_dom = next((node for node in st.session_state.ui_data if dom_keyword.lower() in node["text"].lower()), None) if dom_keyword else None
+        matched_api = find_api_entry(api_keyword)
+        matched_dom = find_ui_node(dom_keyword) if dom_keyword else None
 
         mock_ui_api_mapping = {
             "api_url": matched_api["url"] if matched_api else api_keyword,
@@ -152,6 +213,6 @@ for idx in range(len(st.session_state.ui_api_mappings)):
             "ui_element_html": matched_dom["html"] if matched_dom else "(No UI element matched)"
         }
 
-        st.session_state.ui_api_mapping_json = json.dumps(mock_ui_api_mapping, indent=2)
+        st.session_state.ui_api_mapping_json = _dumps(mock_ui_api_mapping)
 
     st.text_area(f"UI ↔ API Mapping (editable) {idx + 1}", value=st.session_state.ui_api_mapping_json, key=f"ui_api_mapping_editor_{idx}", height=300)
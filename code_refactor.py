@@ -6,77 +6,96 @@ Refactors messy code into clean, maintainable, well-structured code
 
 import os
 import ast
+import functools
 import re
-from typing import Dict, List, Optional, Tuple
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
-import google.generativeai as genai
 from datetime import datetime
+from script_generator import StreamedFileSplitter, code_file, get_model, split_file_sections
 
-class CodeRefactorer:
-    def __init__(self, api_key: str):
-        """Initialize the code refactorer with Gemini API key"""
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
-        self.output_dir = Path("refactored_code")
-        self.output_dir.mkdir(exist_ok=True)
-        
-    def analyze_code_structure(self, code: str, language: str) -> Dict:
-        """Analyze code structure to provide context for refactoring"""
-        analysis = {
-            "language": language,
-            "lines_of_code": len(code.split('\n')),
-            "complexity_indicators": [],
-            "imports": [],
-            "functions": [],
-            "classes": []
-        }
-        
-        if language == "python":
-            try:
-                tree = ast.parse(code)
-                for node in ast.walk(tree):
-                    if isinstance(node, ast.Import):
-                        for alias in node.names:
-                            analysis["imports"].append(alias.name)
-                    elif isinstance(node, ast.ImportFrom):
-                        if node.module:
-                            analysis["imports"].append(f"{node.module}.{', '.join([alias.name for alias in node.names])}")
-                    elif isinstance(node, ast.FunctionDef):
-                        analysis["functions"].append(node.name)
-                    elif isinstance(node, ast.ClassDef):
-                        analysis["classes"].append(node.name)
-            except SyntaxError:
-                analysis["complexity_indicators"].append("Syntax errors present")
-        
-        # General complexity indicators
-        if analysis["lines_of_code"] > 500:
-            analysis["complexity_indicators"].append("Large file (>500 lines)")
-        if len(analysis["functions"]) > 20:
-            analysis["complexity_indicators"].append("Many functions (>20)")
-        if len(analysis["classes"]) > 10:
-            analysis["complexity_indicators"].append("Many classes (>10)")
-        
-        # Check for code smells
-        if "TODO" in code or "FIXME" in code:
-            analysis["complexity_indicators"].append("Contains TODO/FIXME comments")
-        if code.count("except:") > 0:
-            analysis["complexity_indicators"].append("Bare except clauses found")
-        if len(re.findall(r'def \w+\(.*\):(?:\s*\n)*(?:\s{4,}.*\n){20,}', code)) > 0:
-            analysis["complexity_indicators"].append("Very long functions detected")
-            
-        return analysis
-    
-    def get_refactoring_system_prompt(self, language: str, analysis: Dict) -> str:
-        """Generate contextual system prompt based on code analysis"""
-        base_prompt = f"""You are an expert {language} code refactoring specialist with deep knowledge of software engineering best practices.
+# Patterns compiled once at import instead of on every analysis/parse call
+_FUNC_DEF_RE = re.compile(r'([ \t]*)(?:async[ \t]+)?def \w+\(.*\).*:[ \t]*$')
+_CODE_BLOCK_RE = re.compile(r'```\w*\n(.*?)```', re.DOTALL)
+_FENCED_BLOCK_RE = re.compile(r'```.*?```', re.DOTALL)
+_CODE_FENCE_RE = re.compile(r'```\w*\n?')
+_TRAILING_WS_RE = re.compile(r'[^\S\n]+$', re.M)
+_BLANK_RUN_RE = re.compile(r'\n{4,}')
+_LEADING_BLANK_RUN_RE = re.compile(r'\A\n{3,}')
+_SMELL_RE = re.compile(r'TODO|FIXME|except:')
+
+def _has_long_function(code: str, min_body_lines: int = 20) -> bool:
+    """Check for a function whose body spans at least min_body_lines indented lines"""
+    # (indent, non-blank lines seen so far) for each def still open, outermost first;
+    # a body ends at the first non-blank line indented no deeper than its def
+    open_defs: List[Tuple[int, int]] = []
+    seen = 0
+    for line in code.splitlines():
+        stripped = line.lstrip()
+        if not stripped:
+            continue
+        indent = len(line) - len(stripped)
+        while open_defs and open_defs[-1][0] >= indent:
+            open_defs.pop()
+        seen += 1
+        # The outermost open def has the longest body so far
+        if open_defs and seen - open_defs[0][1] >= min_body_lines:
+            return True
+        if _FUNC_DEF_RE.match(line):
+            open_defs.append((indent, seen))
+    return False
+
+class _StructVisitor(ast.NodeVisitor):
+    """Collect imports, functions and classes without descending into function bodies"""
+
+    def __init__(self, imports: List[str], functions: List[str], classes: List[str]):
+        self.imports = imports
+        self.functions = functions
+        self.classes = classes
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            self.imports.append(alias.name)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        if node.module:
+            self.imports.append(f"{node.module}.{', '.join([alias.name for alias in node.names])}")
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        self.functions.append(node.name)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self.classes.append(node.name)
+        for child in node.body:
+            self.visit(child)
+
+    def generic_visit(self, node: ast.AST):
+        # Only statement bodies (including match arms) can hold definitions; skip expressions entirely
+        for field in ("body", "orelse", "finalbody", "handlers", "cases"):
+            for child in getattr(node, field, ()):
+                self.visit(child)
+
+# Placeholder for the exact line count, filled in after the cached template is looked up
+_LINES_OF_CODE_SLOT = "\x00lines_of_code\x00"
+
+@functools.lru_cache(maxsize=64)
+def _refactoring_prompt_template(language: str, analysis_language: str, function_count: int,
+                                 class_count: int, complexity_indicators: Tuple[str, ...],
+                                 imports: Tuple[str, ...], more_imports: bool) -> str:
+    """Build the refactoring system prompt for one analysis signature"""
+    return f"""You are an expert {language} code refactoring specialist with deep knowledge of software engineering best practices.
 
 ANALYSIS OF CURRENT CODE:
-- Language: {analysis['language']}
-- Lines of code: {analysis['lines_of_code']}
-- Functions: {len(analysis['functions'])}
-- Classes: {len(analysis['classes'])}
-- Complexity indicators: {', '.join(analysis['complexity_indicators']) if analysis['complexity_indicators'] else 'None detected'}
-- Imports detected: {', '.join(analysis['imports'][:10])}{'...' if len(analysis['imports']) > 10 else ''}
+- Language: {analysis_language}
+- Lines of code: {_LINES_OF_CODE_SLOT}
+- Functions: {function_count}
+- Classes: {class_count}
+- Complexity indicators: {', '.join(complexity_indicators) if complexity_indicators else 'None detected'}
+- Imports detected: {', '.join(imports)}{'...' if more_imports else ''}
 
 REFACTORING OBJECTIVES:
 1. **Structure & Organization**: Break down large functions/classes into smaller, focused units
@@ -124,11 +143,69 @@ RESPONSE FORMAT:
 2. Refactored code (single file or multiple files with clear separators)
 3. Summary of changes made and benefits achieved
 """
-        return base_prompt
+
+class CodeRefactorer:
+    def __init__(self, api_key: str):
+        """Initialize the code refactorer with Gemini API key"""
+        self.model = get_model(api_key)
+        self.output_dir = Path("refactored_code")
+        self.output_dir.mkdir(exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=8)
+        
+    def analyze_code_structure(self, code: str, language: str) -> Dict:
+        """Analyze code structure to provide context for refactoring"""
+        analysis = {
+            "language": language,
+            "lines_of_code": code.count('\n') + 1,
+            "complexity_indicators": [],
+            "imports": [],
+            "functions": [],
+            "classes": []
+        }
+        
+        if language == "python":
+            try:
+                tree = ast.parse(code)
+                _StructVisitor(analysis["imports"], analysis["functions"], analysis["classes"]).visit(tree)
+            except SyntaxError:
+                analysis["complexity_indicators"].append("Syntax errors present")
+        
+        # General complexity indicators
+        if analysis["lines_of_code"] > 500:
+            analysis["complexity_indicators"].append("Large file (>500 lines)")
+        if len(analysis["functions"]) > 20:
+            analysis["complexity_indicators"].append("Many functions (>20)")
+        if len(analysis["classes"]) > 10:
+            analysis["complexity_indicators"].append("Many classes (>10)")
+        
+        # Check for code smells in a single scan of the source
+        smells = Counter(match.group() for match in _SMELL_RE.finditer(code))
+        if smells["TODO"] or smells["FIXME"]:
+            analysis["complexity_indicators"].append("Contains TODO/FIXME comments")
+        if smells["except:"]:
+            analysis["complexity_indicators"].append("Bare except clauses found")
+        if _has_long_function(code):
+            analysis["complexity_indicators"].append("Very long functions detected")
+            
+        return analysis
+    
+    def get_refactoring_system_prompt(self, language: str, analysis: Dict) -> str:
+        """Generate contextual system prompt based on code analysis"""
+        base_prompt = _refactoring_prompt_template(
+            language,
+            analysis['language'],
+            len(analysis['functions']),
+            len(analysis['classes']),
+            tuple(analysis['complexity_indicators']),
+            tuple(analysis['imports'][:10]),
+            len(analysis['imports']) > 10
+        )
+        return base_prompt.replace(_LINES_OF_CODE_SLOT, str(analysis['lines_of_code']))
     
     def refactor_code(self, code: str, language: str = "python", 
-                     filename: str = None) -> Dict:
-        """Refactor the given code"""
+                     filename: str = None,
+                     on_file: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Refactor the given code, passing each completed file to on_file while the response streams in"""
         try:
             # Analyze code structure first
             analysis = self.analyze_code_structure(code, language)
@@ -152,16 +229,17 @@ Please provide clean, production-ready refactored code that maintains all existi
             full_prompt = f"{system_prompt}\n\n{user_prompt}"
             
             # Generate refactored code
-            response = self.model.generate_content(full_prompt)
+            response = self.model.generate_content(full_prompt, stream=True)
+            raw_response = self.collect_streamed_response(response, language, on_file)
             
             # Parse the response
-            files = self.parse_refactored_response(response.text, language)
+            files = self.parse_refactored_response(raw_response, language)
             
             return {
                 "success": True,
                 "original_analysis": analysis,
                 "files": files,
-                "raw_response": response.text,
+                "raw_response": raw_response,
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -172,21 +250,40 @@ Please provide clean, production-ready refactored code that maintains all existi
                 "timestamp": datetime.now().isoformat()
             }
     
+    def collect_streamed_response(self, response, language: str,
+                                  on_file: Optional[Callable[[Dict], None]] = None) -> str:
+        """Accumulate a streamed response, emitting each file once the next separator (or the end) arrives"""
+        splitter = StreamedFileSplitter(on_file, functools.partial(self.clean_and_validate_code, language=language))
+        for chunk in response:
+            splitter.feed(chunk.text)
+        return splitter.finish()
+    
+    def refactor_many(self, items: List[Tuple[str, str, Optional[str]]]) -> List[Dict]:
+        """Refactor several (code, language, filename) items concurrently, preserving input order"""
+        results: List[Optional[Dict]] = [None] * len(items)
+        futures = {
+            self._executor.submit(self.refactor_code, code, language, filename): index
+            for index, (code, language, filename) in enumerate(items)
+        }
+        
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+        
+        return results
+    
     def parse_refactored_response(self, response: str, language: str) -> List[Dict]:
         """Parse refactored code response that may contain multiple files"""
         files = []
         
-        # Check for file separators
-        file_pattern = r"=== FILENAME: (.+?) ==="
-        file_matches = re.findall(file_pattern, response)
+        split = split_file_sections(response)
         
-        if file_matches:
+        if split is not None:
             # Multiple files
-            parts = re.split(file_pattern, response)
+            head, sections = split
             
             # First part contains explanation
-            if parts[0].strip():
-                explanation = self.extract_explanation(parts[0])
+            if head.strip():
+                explanation = self.extract_explanation(head)
                 if explanation:
                     files.append({
                         "filename": "REFACTORING_NOTES.md",
@@ -194,20 +291,8 @@ Please provide clean, production-ready refactored code that maintains all existi
                         "type": "documentation"
                     })
             
-            # Process file pairs
-            for i in range(1, len(parts), 2):
-                if i + 1 < len(parts):
-                    filename = parts[i].strip()
-                    content = parts[i + 1].strip()
-                    
-                    # Clean and validate code
-                    content = self.clean_and_validate_code(content, language)
-                    
-                    files.append({
-                        "filename": filename,
-                        "content": content,
-                        "type": "code"
-                    })
+            clean = functools.partial(self.clean_and_validate_code, language=language)
+            files.extend(code_file(filename, section, clean) for filename, section in sections)
         else:
             # Single file with embedded explanation
             explanation, code = self.separate_explanation_and_code(response)
@@ -232,7 +317,7 @@ Please provide clean, production-ready refactored code that maintains all existi
     def extract_explanation(self, text: str) -> str:
         """Extract explanation text from response"""
         # Remove code blocks and clean up explanation
-        explanation = re.sub(r'```.*?```', '', text, flags=re.DOTALL)
+        explanation = _FENCED_BLOCK_RE.sub('', text)
         explanation = explanation.strip()
         
         if len(explanation) > 50:  # Only return substantial explanations
@@ -241,14 +326,14 @@ Please provide clean, production-ready refactored code that maintains all existi
     
     def separate_explanation_and_code(self, response: str) -> Tuple[str, str]:
         """Separate explanation from code in a single response"""
-        code_blocks = re.findall(r'```\w*\n(.*?)```', response, re.DOTALL)
+        code_blocks = _CODE_BLOCK_RE.findall(response)
         
         if code_blocks:
             # Largest code block is likely the main code
             code = max(code_blocks, key=len).strip()
             
             # Everything else is explanation
-            explanation = re.sub(r'```.*?```', '', response, flags=re.DOTALL).strip()
+            explanation = _FENCED_BLOCK_RE.sub('', response).strip()
             
             return explanation, code
         
@@ -257,29 +342,17 @@ Please provide clean, production-ready refactored code that maintains all existi
     
     def clean_and_validate_code(self, code: str, language: str) -> str:
         """Clean and validate refactored code"""
-        # Remove markdown code block markers
-        code = re.sub(r'```\w*\n?', '', code)
-        code = re.sub(r'```', '', code)
-        
-        # Remove excessive blank lines
-        lines = code.split('\n')
-        cleaned_lines = []
-        blank_count = 0
+        # Remove markdown code block markers; bare ``` is covered by the empty language tag
+        code = _CODE_FENCE_RE.sub('', code)
         
-        for line in lines:
-            if line.strip() == '':
-                blank_count += 1
-                if blank_count <= 2:  # Allow max 2 consecutive blank lines
-                    cleaned_lines.append('')
-            else:
-                blank_count = 0
-                cleaned_lines.append(line.rstrip())
+        # Strip trailing whitespace, then allow max 2 consecutive blank lines
+        code = _TRAILING_WS_RE.sub('', code)
+        code = _BLANK_RUN_RE.sub('\n\n\n', code)
+        # At the start no preceding line ends in a newline, so two blank lines are just two newlines
+        code = _LEADING_BLANK_RUN_RE.sub('\n\n', code)
         
         # Remove trailing blank lines
-        while cleaned_lines and cleaned_lines[-1] == '':
-            cleaned_lines.pop()
-        
-        return '\n'.join(cleaned_lines)
+        return code.rstrip()
     
     def refactor_file(self, file_path: str, language: str = None) -> Dict:
         """Refactor code from a file"""
@@ -316,10 +389,14 @@ Please provide clean, production-ready refactored code that maintains all existi
         # Refactor the code
         return self.refactor_code(code, language, file_path.name)
     
+    def default_project_name(self) -> str:
+        """Name for a refactoring output directory when none is given"""
+        return f"refactored_{time.time_ns():x}"
+    
     def save_refactored_files(self, files: List[Dict], project_name: str = None) -> List[str]:
         """Save refactored files to disk"""
         if not project_name:
-            project_name = f"refactored_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            project_name = self.default_project_name()
         
         project_dir = self.output_dir / project_name
         project_dir.mkdir(exist_ok=True)
@@ -329,7 +406,7 @@ Please provide clean, production-ready refactored code that maintains all existi
         for file_info in files:
             file_path = project_dir / file_info["filename"]
             
-            with open(file_path, 'w', encoding='utf-8') as f:
+            with open(file_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
                 f.write(file_info["content"])
             
             saved_files.append(str(file_path))
@@ -339,12 +416,25 @@ Please provide clean, production-ready refactored code that maintains all existi
     
     def refactor_and_save(self, code: str, language: str = "python", 
                          filename: str = None, project_name: str = None) -> Dict:
-        """Refactor code and save results in one operation"""
-        result = self.refactor_code(code, language, filename)
+        """Refactor code and save results in one operation, writing code files as soon as they stream in
+        
+        "saved_files" is set even when refactoring fails, listing any files written before the failure.
+        """
+        project_name = project_name or self.default_project_name()
+        saved_files = []
+        streamed = set()
+        
+        def save_streamed(file_info: Dict):
+            saved_files.extend(self.save_refactored_files([file_info], project_name))
+            streamed.add(file_info["filename"])
+        
+        result = self.refactor_code(code, language, filename, on_file=save_streamed)
+        # On failure these are whatever streamed in before the error, i.e. a partial project
+        result["saved_files"] = saved_files
         
         if result["success"]:
-            saved_files = self.save_refactored_files(result["files"], project_name)
-            result["saved_files"] = saved_files
+            remaining = [file_info for file_info in result["files"] if file_info["filename"] not in streamed]
+            saved_files.extend(self.save_refactored_files(remaining, project_name))
             
             # Print summary
             print(f"\n=== Refactoring Summary ===")
@@ -1,28 +1,91 @@
-=#!/usr/bin/env python3
+#!/usr/bin/env python3
 """
 Advanced Script Generator using Gemini API
 Generates clean, well-structured scripts based on prompts and saves to files
 """
 
 import os
+import asyncio
+import functools
+import hashlib
 import json
+import random
 import re
-from typing import Dict, List, Optional, Tuple
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
 from datetime import datetime
 
-class ScriptGenerator:
-    def __init__(self, api_key: str):
-        """Initialize the script generator with Gemini API key"""
+try:
+    from google import genai as genai_client  # google-genai SDK, needed for Batch Mode
+except ImportError:
+    genai_client = None
+
+# Patterns compiled once at import instead of on every parse call
+_FILE_SEP_RE = re.compile(r"=== FILENAME: (.+?) ===")
+# Fence lines only: a ``` inside a string literal or comment is left alone
+_FENCE_RE = re.compile(r"^[ \t]*```[\w+\-]*[ \t]*\r?$\n?", re.MULTILINE)
+# Any whitespace but the newline itself, so the \r of CRLF line endings goes too
+_TRAILING_WS_RE = re.compile(r"[^\S\n]+(?=\n)")
+
+# SDK configuration and model clients shared by every ScriptGenerator and CodeRefactorer
+_CONFIGURED = False
+_MODELS: Dict[str, genai.GenerativeModel] = {}
+
+def get_model(api_key: str, model_name: str = 'gemini-pro') -> genai.GenerativeModel:
+    """Return the process-wide model client for model_name, configuring the SDK on first use
+    
+    The API key of the first call wins; later keys are ignored.
+    """
+    global _CONFIGURED
+    if not _CONFIGURED:
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
-        self.output_dir = Path("generated_scripts")
-        self.output_dir.mkdir(exist_ok=True)
-        
-    def get_script_generation_prompt(self, language: str) -> str:
-        """Get the system prompt for script generation"""
-        return f"""You are an expert {language} developer specializing in automation testing and development tools.
+        _CONFIGURED = True
+    if model_name not in _MODELS:
+        _MODELS[model_name] = genai.GenerativeModel(model_name)
+    return _MODELS[model_name]
+
+# The SDK shares one grpc-aio client across the process, and it only works on the event loop that
+# first used it, so every model call runs on this one long-lived loop
+_MODEL_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_MODEL_LOOP_LOCK = threading.Lock()
+
+def _model_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide model event loop, starting its thread on first use"""
+    global _MODEL_LOOP
+    with _MODEL_LOOP_LOCK:
+        if _MODEL_LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="gemini-model-loop", daemon=True).start()
+            _MODEL_LOOP = loop
+    return _MODEL_LOOP
+
+def _run_on_model_loop(coro):
+    """Run a coroutine to completion on the model loop from synchronous code"""
+    return asyncio.run_coroutine_threadsafe(coro, _model_loop()).result()
+
+async def _await_on_model_loop(coro):
+    """Await a coroutine on the model loop from whichever event loop the caller is running"""
+    loop = _model_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+def _prompt_parts(system_prompt: str, prompt: str) -> List[Dict[str, str]]:
+    """Content parts for an inline system prompt followed by the user request"""
+    return [{"text": system_prompt}, {"text": "\n\nUSER REQUEST:\n"}, {"text": prompt}]
+
+# System prompts depend only on the language, so each is built once
+@functools.lru_cache(maxsize=8)
+def _script_prompt(language: str) -> str:
+    """Get the system prompt for script generation"""
+    return f"""You are an expert {language} developer specializing in automation testing and development tools.
 
 Your task is to generate clean, well-structured, production-ready code based on user requirements.
 
@@ -45,9 +108,10 @@ OUTPUT FORMAT:
 
 Focus on creating production-ready code that can be used immediately without placeholder implementations."""
 
-    def get_refactoring_prompt(self, language: str) -> str:
-        """Get the system prompt for code refactoring"""
-        return f"""You are an expert {language} code refactoring specialist.
+@functools.lru_cache(maxsize=8)
+def _refactor_prompt(language: str) -> str:
+    """Get the system prompt for code refactoring"""
+    return f"""You are an expert {language} code refactoring specialist.
 
 Your task is to refactor messy, poorly structured code into clean, maintainable, professional-quality code.
 
@@ -78,130 +142,545 @@ OUTPUT FORMAT:
 
 IMPORTANT: Never create mock classes or placeholder implementations. Keep all real functionality intact."""
 
+def _clean_code_content(content: str) -> str:
+    """Clean up code content by removing markdown formatting"""
+    # Remove code block markers
+    content = _FENCE_RE.sub('', content)
+    
+    # Remove trailing whitespace on every line in one pass
+    return _TRAILING_WS_RE.sub('', content).strip()
+
+def code_file(filename: str, content: str, clean: Callable[[str], str] = _clean_code_content) -> Dict:
+    """Build a code file entry from a raw response section"""
+    return {
+        "filename": filename,
+        "content": clean(content.strip()),
+        "type": "code"
+    }
+
+def split_file_sections(response: str) -> Optional[Tuple[str, List[Tuple[str, str]]]]:
+    """Split a response on its file separators, scanning it only once
+    
+    Returns the text before the first separator and a (filename, raw section) pair per file,
+    or None when the response has no separators.
+    """
+    file_matches = list(_FILE_SEP_RE.finditer(response))
+    if not file_matches:
+        return None
+    
+    # Each file runs from the end of its separator to the start of the next one
+    ends = [match.start() for match in file_matches[1:]] + [len(response)]
+    sections = [(match.group(1).strip(), response[match.end():end]) for match, end in zip(file_matches, ends)]
+    return response[:file_matches[0].start()], sections
+
+class StreamedFileSplitter:
+    """Accumulate a streamed response, emitting each file once the next separator (or the end) arrives"""
+    
+    def __init__(self, on_file: Optional[Callable[[Dict], None]] = None,
+                 clean: Callable[[str], str] = _clean_code_content):
+        self._on_file = on_file
+        self._clean = clean
+        self._chunks: List[str] = []
+        self._pending = ""
+        self._filename: Optional[str] = None
+    
+    def feed(self, text: str):
+        """Add the next chunk of streamed text"""
+        self._chunks.append(text)
+        if self._on_file is None:
+            return
+        
+        # Separators never span lines, so earlier complete lines need no rescanning
+        start = self._pending.rfind("\n") + 1
+        self._pending += text
+        while True:
+            match = _FILE_SEP_RE.search(self._pending, start)
+            if not match:
+                break
+            if self._filename is not None:
+                self._on_file(code_file(self._filename, self._pending[:match.start()], self._clean))
+            self._filename = match.group(1).strip()
+            self._pending = self._pending[match.end():]
+            start = 0
+    
+    def finish(self) -> str:
+        """Emit the last file and return the full response text"""
+        if self._on_file is not None and self._filename is not None:
+            self._on_file(code_file(self._filename, self._pending, self._clean))
+        return "".join(self._chunks)
+
+# Parsing is pure, so responses replayed from the cache are split only once
+@functools.lru_cache(maxsize=128)
+def _parse_cached(response: str, language: str) -> Tuple[Dict, ...]:
+    """Split a response into file entries"""
+    split = split_file_sections(response)
+    
+    if split is not None:
+        head, sections = split
+        
+        # One slot per file plus an optional README, filled by index
+        files = [None] * (len(sections) + 1)
+        idx = 0
+        
+        # First part might contain general explanation
+        head = head.strip()
+        if head:
+            files[idx] = {
+                "filename": "README.md",
+                "content": head,
+                "type": "documentation"
+            }
+            idx += 1
+        
+        for filename, section in sections:
+            files[idx] = code_file(filename, section)
+            idx += 1
+        del files[idx:]
+        return tuple(files)
+    
+    # Single file response
+    content = _clean_code_content(response)
+    extension = "py" if language == "python" else "ts"
+    
+    return ({
+        "filename": f"generated_script.{extension}",
+        "content": content,
+        "type": "code"
+    },)
+
+def _report_saved(paths: List[str]):
+    """Report saved files with one write to stdout rather than a print per file"""
+    if paths:
+        sys.stdout.write("".join(f"Saved: {path}\n" for path in paths))
+
+# Rate-limit and overload errors worth retrying with backoff
+_RETRYABLE_ERRORS = (api_exceptions.ResourceExhausted, api_exceptions.ServiceUnavailable)
+MAX_RETRIES = 5
+
+def _estimate_tokens(*texts: str) -> int:
+    """Rough token count (about four characters per token) for rate limiting"""
+    return sum(len(text) for text in texts) // 4 + 1
+
+class TokenBucket:
+    """Per-minute request and token budgets, refilled continuously"""
+    
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self, tokens: int = 0) -> float:
+        """Take one request and tokens from the budget, returning the seconds to wait before sending
+        
+        The budget may go negative, so concurrent callers queue up behind each other.
+        """
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60) - 1
+            # A request larger than the whole budget can only ever wait for a full bucket
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60) - min(tokens, self.tpm)
+            return max(0.0, -self._requests * 60 / self.rpm, -self._tokens * 60 / self.tpm)
+
+# Terminal states of a Gemini batch job
+_BATCH_DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+class ScriptGenerator:
+    def __init__(self, api_key: str, cache_enabled: bool = True, cache_ttl: int = 24 * 60 * 60,
+                 max_concurrent_requests: int = 5, requests_per_minute: int = 5,
+                 tokens_per_minute: int = 32_000):
+        """Initialize the script generator with Gemini API key
+        
+        Responses are cached on disk under generated_scripts/.cache for cache_ttl seconds.
+        At most max_concurrent_requests API calls are in flight at once, and calls are paced to
+        stay within requests_per_minute and tokens_per_minute (free tier defaults).
+        """
+        self._api_key = api_key
+        self.model = get_model(api_key)
+        self.output_dir = Path("generated_scripts")
+        self.output_dir.mkdir(exist_ok=True)
+        # Directories known to exist, so each is created at most once per generator
+        self._created_dirs = {self.output_dir}
+        self.cache_dir = self.output_dir / ".cache"
+        self.cache_enabled = cache_enabled
+        self.cache_ttl = cache_ttl
+        self.cache_stats = {"hits": 0, "misses": 0}
+        self.max_concurrent_requests = max_concurrent_requests
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._io_pool = ThreadPoolExecutor(max_workers=8)
+        self._bucket = TokenBucket(rpm=requests_per_minute, tpm=tokens_per_minute)
+        
+    def get_script_generation_prompt(self, language: str) -> str:
+        """Get the system prompt for script generation"""
+        return _script_prompt(language)
+
+    def get_refactoring_prompt(self, language: str) -> str:
+        """Get the system prompt for code refactoring"""
+        return _refactor_prompt(language)
+
     def generate_script(self, prompt: str, language: str = "python", 
                        task_type: str = "script") -> Dict:
         """Generate a script based on the given prompt"""
+        return _run_on_model_loop(self.generate_script_async(prompt, language, task_type))
+    
+    async def generate_script_async(self, prompt: str, language: str = "python",
+                                    task_type: str = "script",
+                                    on_file: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Generate a script without blocking the event loop, so several can run concurrently
+        
+        When on_file is given, each separated file is passed to it as soon as it has streamed in.
+        """
+        now = datetime.now().isoformat()
+        if not prompt or not prompt.strip():
+            # Nothing to generate from; don't spend a billed round trip on it
+            return {
+                "success": False,
+                "error": "empty prompt",
+                "timestamp": now
+            }
+        
         try:
-            # Select appropriate system prompt
-            if task_type == "refactor":
-                system_prompt = self.get_refactoring_prompt(language)
-            else:
-                system_prompt = self.get_script_generation_prompt(language)
-            
-            # Combine system and user prompts
-            full_prompt = f"{system_prompt}\n\nUSER REQUEST:\n{prompt}"
+            system_prompt = self.get_system_prompt(language, task_type)
             
-            # Generate response
-            response = self.model.generate_content(full_prompt)
+            # Generate response, reusing a cached one for identical requests
+            response_text = await self.generate_response_text(system_prompt, prompt, language, task_type,
+                                                              on_file)
             
             # Parse the response to extract files
-            files = self.parse_multi_file_response(response.text, language)
+            files = self.parse_multi_file_response(response_text, language)
             
             return {
                 "success": True,
                 "files": files,
-                "raw_response": response.text,
-                "timestamp": datetime.now().isoformat()
+                "raw_response": response_text,
+                "timestamp": now
             }
             
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
-                "timestamp": datetime.now().isoformat()
+                "timestamp": now
             }
     
-    def parse_multi_file_response(self, response: str, language: str) -> List[Dict]:
-        """Parse response that may contain multiple files"""
-        files = []
+    def get_system_prompt(self, language: str, task_type: str) -> str:
+        """Select the system prompt for a task type"""
+        if task_type == "refactor":
+            return self.get_refactoring_prompt(language)
+        return self.get_script_generation_prompt(language)
+    
+    def generate_batch(self, requests: List[Dict], poll_interval: float = 10.0) -> List[Dict]:
+        """Generate scripts for many requests in one Gemini Batch Mode job
         
-        # Check if response contains file separators
-        file_pattern = r"=== FILENAME: (.+?) ==="
-        file_matches = re.findall(file_pattern, response)
+        Each request is a dict with "prompt" and optional "language" and "task_type".
+        Results come back in request order, shaped like generate_script results.
+        Falls back to sequential generate_script calls without the google-genai SDK.
+        """
+        if genai_client is None:
+            return [self.generate_script(**request) for request in requests]
         
-        if file_matches:
-            # Split response by file separators
-            parts = re.split(file_pattern, response)
-            
-            # First part might contain general explanation
-            if parts[0].strip():
-                files.append({
-                    "filename": "README.md",
-                    "content": parts[0].strip(),
-                    "type": "documentation"
-                })
-            
-            # Process file pairs (filename, content)
-            for i in range(1, len(parts), 2):
-                if i + 1 < len(parts):
-                    filename = parts[i].strip()
-                    content = parts[i + 1].strip()
-                    
-                    # Clean up code blocks
-                    content = self.clean_code_content(content)
-                    
-                    files.append({
-                        "filename": filename,
-                        "content": content,
-                        "type": "code"
-                    })
-        else:
-            # Single file response
-            content = self.clean_code_content(response)
-            extension = "py" if language == "python" else "ts"
+        now = datetime.now().isoformat()
+        results: List[Optional[Dict]] = [None] * len(requests)
+        
+        # Empty prompts and cached responses are answered locally; only the rest are uploaded
+        batch_requests = {}
+        cache_keys = {}
+        for i, request in enumerate(requests):
+            prompt = request.get("prompt", "")
+            language = request.get("language", "python")
+            if not prompt or not prompt.strip():
+                results[i] = {
+                    "success": False,
+                    "error": "empty prompt",
+                    "timestamp": now
+                }
+                continue
             
-            files.append({
-                "filename": f"generated_script.{extension}",
-                "content": content,
-                "type": "code"
-            })
+            if self.cache_enabled:
+                key = self._cache_key(prompt, language, request.get("task_type", "script"))
+                cached = self._load_cached_response(key)
+                if cached is not None:
+                    self.cache_stats["hits"] += 1
+                    results[i] = {
+                        "success": True,
+                        "files": self.parse_multi_file_response(cached, language),
+                        "raw_response": cached,
+                        "timestamp": now
+                    }
+                    continue
+                self.cache_stats["misses"] += 1
+                cache_keys[i] = key
+            batch_requests[i] = request
         
-        return files
+        if not batch_requests:
+            return results
+        
+        try:
+            response_texts, errors = self._run_batch_job(batch_requests, poll_interval)
+        except Exception as e:
+            for i in batch_requests:
+                results[i] = {
+                    "success": False,
+                    "error": str(e),
+                    "timestamp": now
+                }
+            return results
+        
+        for i, request in batch_requests.items():
+            response_text = response_texts.get(f"req_{i}")
+            if response_text is None:
+                results[i] = {
+                    "success": False,
+                    "error": errors.get(f"req_{i}", f"No batch response for request {i}"),
+                    "timestamp": now
+                }
+                continue
+            
+            if i in cache_keys:
+                self._store_cached_response(cache_keys[i], response_text)
+            results[i] = {
+                "success": True,
+                "files": self.parse_multi_file_response(response_text, request.get("language", "python")),
+                "raw_response": response_text,
+                "timestamp": now
+            }
+        return results
     
-    def clean_code_content(self, content: str) -> str:
-        """Clean up code content by removing markdown formatting"""
-        # Remove code block markers
-        content = re.sub(r'```\w*\n', '', content)
-        content = re.sub(r'```', '', content)
+    def _run_batch_job(self, requests: Dict[int, Dict],
+                       poll_interval: float) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Submit requests, keyed by their index, as a JSONL batch job
+        
+        Returns response texts and error messages, both by request key ("req_<index>").
+        """
+        client = genai_client.Client(api_key=self._api_key)
         
-        # Remove excessive whitespace
-        lines = content.split('\n')
-        cleaned_lines = []
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8', delete=False) as f:
+            for i, request in requests.items():
+                system_prompt = self.get_system_prompt(request.get("language", "python"),
+                                                       request.get("task_type", "script"))
+                f.write(json.dumps({
+                    "key": f"req_{i}",
+                    "request": {"contents": [{"parts": _prompt_parts(system_prompt, request['prompt'])}]}
+                }) + "\n")
         
-        for line in lines:
-            cleaned_lines.append(line.rstrip())
+        try:
+            uploaded = client.files.upload(file=f.name, config={"mime_type": "jsonl"})
+        finally:
+            os.unlink(f.name)
+        
+        job = client.batches.create(model=self.model.model_name, src=uploaded.name)
+        while job.state.name not in _BATCH_DONE_STATES:
+            time.sleep(poll_interval)
+            job = client.batches.get(name=job.name)
         
-        return '\n'.join(cleaned_lines).strip()
+        if job.state.name != "JOB_STATE_SUCCEEDED":
+            raise RuntimeError(f"Batch job {job.name} ended in {job.state.name}")
+        
+        response_texts = {}
+        errors = {}
+        for line in client.files.download(file=job.dest.file_name).decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            key = item.get("key")
+            if "response" in item:
+                # Each line stands alone: a blocked or filtered item must not discard the others
+                response = item["response"]
+                candidates = response.get("candidates") or []
+                if not candidates:
+                    block_reason = response.get("promptFeedback", {}).get("blockReason", "no candidates")
+                    errors[key] = f"Prompt blocked: {block_reason}"
+                    continue
+                parts = candidates[0].get("content", {}).get("parts")
+                if not parts:
+                    errors[key] = f"No content returned (finish reason: {candidates[0].get('finishReason', 'unknown')})"
+                    continue
+                response_texts[key] = "".join(part.get("text", "") for part in parts)
+            elif "error" in item:
+                error = item["error"]
+                errors[key] = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+        return response_texts, errors
     
-    def save_files(self, files: List[Dict], project_name: str = None) -> List[str]:
-        """Save generated files to disk"""
-        if not project_name:
-            project_name = f"project_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    async def generate_response_text(self, system_prompt: str, prompt: str, language: str,
+                                     task_type: str,
+                                     on_file: Optional[Callable[[Dict], None]] = None) -> str:
+        """Get the model response text for a request, served from the on-disk cache when fresh"""
+        key = None
+        if self.cache_enabled:
+            key = self._cache_key(prompt, language, task_type)
+            cached = self._load_cached_response(key)
+            if cached is not None:
+                self.cache_stats["hits"] += 1
+                return cached
+            self.cache_stats["misses"] += 1
         
-        project_dir = self.output_dir / project_name
-        project_dir.mkdir(exist_ok=True)
+        emitted = False
         
-        saved_files = []
+        def emit(file_info: Dict):
+            nonlocal emitted
+            emitted = True
+            on_file(file_info)
         
-        for file_info in files:
-            file_path = project_dir / file_info["filename"]
-            
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(file_info["content"])
-            
-            saved_files.append(str(file_path))
-            print(f"Saved: {file_path}")
+        tokens = _estimate_tokens(system_prompt, prompt)
+        for attempt in range(MAX_RETRIES):
+            delay = self._bucket.reserve(tokens)
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                async with self._request_semaphore():
+                    response_text = await _await_on_model_loop(
+                        self._request_response_text(system_prompt, prompt, emit if on_file is not None else None)
+                    )
+                break
+            except _RETRYABLE_ERRORS:
+                # A retry would stream the files already handed to on_file a second time
+                if emitted or attempt == MAX_RETRIES - 1:
+                    raise
+                # Back off outside the semaphore so other requests can still go out
+                await asyncio.sleep(min(60, 2 ** attempt + random.random()))
         
+        if key is not None:
+            self._store_cached_response(key, response_text)
+        return response_text
+    
+    async def _request_response_text(self, system_prompt: str, prompt: str,
+                                     on_file: Optional[Callable[[Dict], None]]) -> str:
+        """Send a single request to the model and collect its streamed response"""
+        # Send system and user prompts as separate parts rather than one concatenated string
+        response = await self.model.generate_content_async(
+            [{"role": "user", "parts": _prompt_parts(system_prompt, prompt)}],
+            stream=True
+        )
+        return await self._collect_stream(response, on_file)
+    
+    async def _collect_stream(self, response, on_file: Optional[Callable[[Dict], None]]) -> str:
+        """Accumulate a streamed response, passing each completed file to on_file"""
+        splitter = StreamedFileSplitter(on_file)
+        async for chunk in response:
+            splitter.feed(chunk.text)
+        return splitter.finish()
+    
+    def _request_semaphore(self) -> asyncio.Semaphore:
+        """Semaphore capping in-flight requests, recreated for each event loop"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+            self._semaphore_loop = loop
+        return self._semaphore
+    
+    def _cache_key(self, prompt: str, language: str, task_type: str) -> str:
+        """Stable hash identifying a request for the response cache"""
+        payload = json.dumps(
+            {"p": prompt, "l": language, "t": task_type, "m": self.model.model_name},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _load_cached_response(self, key: str) -> Optional[str]:
+        """Return the cached response text for key, or None if missing or expired"""
+        cache_path = self.cache_dir / f"{key}.json"
+        try:
+            if time.time() - cache_path.stat().st_mtime > self.cache_ttl:
+                return None
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)["text"]
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def _store_cached_response(self, key: str, response_text: str):
+        """Atomically write a response to the cache"""
+        self.cache_dir.mkdir(exist_ok=True)
+        cache_path = self.cache_dir / f"{key}.json"
+        tmp_path = cache_path.with_suffix('.tmp')
+        tmp_path.write_text(
+            json.dumps({"text": response_text, "created": datetime.now().isoformat()}),
+            encoding='utf-8'
+        )
+        tmp_path.replace(cache_path)
+    
+    def parse_multi_file_response(self, response: str, language: str) -> List[Dict]:
+        """Parse response that may contain multiple files"""
+        if not response:
+            return []
+        
+        # Copy so callers can't mutate the cached entries
+        return [dict(file_info) for file_info in _parse_cached(response, language)]
+    
+    def clean_code_content(self, content: str) -> str:
+        """Clean up code content by removing markdown formatting"""
+        return _clean_code_content(content)
+    
+    def save_files(self, files: List[Dict], project_name: str = None) -> List[str]:
+        """Save generated files to disk"""
+        saved_files = self._save_to_dir(files, self._project_dir(project_name))
+        _report_saved(saved_files)
         return saved_files
     
+    def _project_dir(self, project_name: str = None) -> Path:
+        """Return the output directory for a project; it is created when the first file is written"""
+        if not project_name:
+            # Low bits of the monotonic clock keep same-second projects from sharing a directory
+            project_name = f"project_{time.strftime('%Y%m%d_%H%M%S')}_{time.monotonic_ns() & 0xffff:04x}"
+        return self.output_dir / project_name
+    
+    def _ensure_dir(self, project_dir: Path):
+        """Create a project directory unless this generator already has"""
+        if project_dir not in self._created_dirs:
+            project_dir.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(project_dir)
+    
+    def _save_to_dir(self, files: List[Dict], project_dir: Path) -> List[str]:
+        """Write files into a project directory, creating it if there is anything to write"""
+        if not files:
+            return []
+        self._ensure_dir(project_dir)
+        if len(files) == 1:
+            return [self._write_one(file_info, project_dir) for file_info in files]
+        
+        # Overlap the writes; the GIL is released while each thread waits on the disk
+        return list(self._io_pool.map(self._write_one, files, [project_dir] * len(files)))
+    
+    def _write_one(self, file_info: Dict, project_dir: Path) -> str:
+        """Write a single generated file and return its path"""
+        file_path = project_dir / file_info["filename"]
+        file_path.write_bytes(file_info["content"].encode('utf-8'))
+        return str(file_path)
+    
     def generate_and_save(self, prompt: str, language: str = "python", 
                          task_type: str = "script", project_name: str = None) -> Dict:
         """Generate script and save to files in one operation"""
-        result = self.generate_script(prompt, language, task_type)
+        return _run_on_model_loop(self.generate_and_save_async(prompt, language, task_type, project_name))
+    
+    async def generate_and_save_async(self, prompt: str, language: str = "python",
+                                      task_type: str = "script", project_name: str = None) -> Dict:
+        """Async counterpart of generate_and_save, for running several generations with asyncio.gather
+        
+        Separated files are written in the background while the rest of the response streams in.
+        "saved_files" is set even when generation fails, listing any files written before the failure.
+        """
+        project_dir = self._project_dir(project_name)
+        streamed = []
+        
+        def save_streamed(file_info: Dict):
+            self._ensure_dir(project_dir)
+            streamed.append((file_info["filename"], self._io_pool.submit(self._write_one, file_info, project_dir)))
+        
+        result = await self.generate_script_async(prompt, language, task_type, on_file=save_streamed)
+        saved_files = [await asyncio.wrap_future(future) for _, future in streamed]
         
         if result["success"]:
-            saved_files = self.save_files(result["files"], project_name)
-            result["saved_files"] = saved_files
+            streamed_names = {filename for filename, _ in streamed}
+            remaining = [file_info for file_info in result["files"] if file_info["filename"] not in streamed_names]
+            saved_files.extend(self._save_to_dir(remaining, project_dir))
+        
+        # On failure these are whatever streamed in before the error, i.e. a partial project
+        result["saved_files"] = saved_files
+        _report_saved(saved_files)
         
         return result
 
@@ -5,9 +5,11 @@ Demonstrates practical usage of both tools with automation testing features
 """
 
 import os
+import argparse
+import asyncio
 from pathlib import Path
 from script_generator import ScriptGenerator
-from code_refactorer import CodeRefactorer
+from code_refactor import CodeRefactorer
 
 def demonstrate_script_generation():
     """Demonstrate script generation with automation testing features"""
@@ -21,8 +23,7 @@ def demonstrate_script_generation():
     
     generator = ScriptGenerator(api_key)
     
-    # Example 1: Generate Test Prioritization System (from your requirements)
-    print("\n📋 Generating Automated Test Prioritization System...")
+    # Example 1: Test Prioritization System (from your requirements)
     
     prioritization_prompt = """
     Create a Python system for Automated Test Prioritization that optimizes test execution order in CI/CD pipelines.
@@ -52,21 +53,7 @@ def demonstrate_script_generation():
     The system should speed up CI/CD feedback by running high-risk tests first.
     """
     
-    result = generator.generate_and_save(
-        prioritization_prompt,
-        language="python",
-        project_name="test_prioritization_system"
-    )
-    
-    if result["success"]:
-        print(f"✅ Generated {len(result['files'])} files for Test Prioritization System")
-        for file_path in result["saved_files"]:
-            print(f"   📄 {file_path}")
-    else:
-        print(f"❌ Generation failed: {result['error']}")
-    
-    # Example 2: Generate Environment Issue Predictor (TypeScript)
-    print("\n🌍 Generating Environment Issue Predictor...")
+    # Example 2: Environment Issue Predictor (TypeScript)
     
     environment_prompt = """
     Create a TypeScript application for Environment Issue Prediction in automation testing.
@@ -97,18 +84,31 @@ def demonstrate_script_generation():
     Focus on preventing environment-related test failures proactively.
     """
     
-    result = generator.generate_and_save(
-        environment_prompt,
-        language="typescript",
-        project_name="environment_issue_predictor"
-    )
-    
-    if result["success"]:
-        print(f"✅ Generated {len(result['files'])} files for Environment Issue Predictor")
-        for file_path in result["saved_files"]:
-            print(f"   📄 {file_path}")
-    else:
-        print(f"❌ Generation failed: {result['error']}")
+    # Generate both projects concurrently instead of one blocking call after another
+    print("\n🚀 Generating both projects concurrently...")
+    
+    projects = [
+        ("Test Prioritization System", "test_prioritization_system",
+         {"prompt": prioritization_prompt, "language": "python"}),
+        ("Environment Issue Predictor", "environment_issue_predictor",
+         {"prompt": environment_prompt, "language": "typescript"}),
+    ]
+    results = asyncio.run(generate_projects(generator, projects))
+    
+    for (title, _, _), result in zip(projects, results):
+        if result["success"]:
+            print(f"✅ Generated {len(result['files'])} files for {title}")
+            for file_path in result["saved_files"]:
+                print(f"   📄 {file_path}")
+        else:
+            print(f"❌ Generation failed for {title}: {result['error']}")
+
+async def generate_projects(generator, projects):
+    """Run generate_and_save for each (title, project_name, request) concurrently"""
+    return await asyncio.gather(*(
+        generator.generate_and_save_async(project_name=project_name, **request)
+        for _, project_name, request in projects
+    ))
 
 def demonstrate_code_refactoring():
     """Demonstrate code refactoring with a complex legacy script"""
@@ -426,6 +426,17 @@ do_everything()
 
 def main():
     """Main demonstration function"""
+    demos = {
+        "script": demonstrate_script_generation,
+        "refactor": demonstrate_code_refactoring,
+        "file": demonstrate_file_refactoring,
+    }
+    
+    parser = argparse.ArgumentParser(description="GenAI Automation Testing Tools Demo")
+    parser.add_argument("--demo", choices=[*demos, "all"], default="all",
+                        help="run only the selected demo (default: all)")
+    args = parser.parse_args()
+    
     print("🎯 GenAI Automation Testing Tools Demo")
     print("=" * 50)
     
@@ -436,20 +447,16 @@ def main():
         return
     
     try:
-        # Demonstrate script generation
-        demonstrate_script_generation()
-        
-        print("\n" + "=" * 50)
-        
-        # Demonstrate code refactoring
-        demonstrate_code_refactoring()
-        
-        print("\n" + "=" * 50)
-        
-        # Demonstrate file-based refactoring
-        demonstrate_file_refactoring()
+        # Script generation, code refactoring and file-based refactoring, or just the one asked for
+        selected = list(demos.values()) if args.demo == "all" else [demos[args.demo]]
+        for i, demo in enumerate(selected):
+            if i:
+                print("\n" + "=" * 50)
+            demo()
         
         print("\n🎉 Demo completed successfully!")
+        if args.demo != "all":
+            return
         print("\n📋 Summary:")
         print("✅ Generated multiple automation testing tools")
         print("✅ Refactored legacy code into clean modules")